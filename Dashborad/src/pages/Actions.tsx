@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
@@ -17,7 +17,7 @@ interface AutomationRule {
   enabled: boolean;
   sensorDeviceId: string;
   sensorDataType: string;
-  condition: "above" | "below" | "equals";
+  condition: "above" | "below" | "equals" | "anomaly";
   threshold: number;
   actionType: "device_command" | "telegram" | "notification";
   targetDeviceId?: string;
@@ -26,6 +26,11 @@ interface AutomationRule {
 }
 
 const STORAGE_KEY = "automation-rules";
+const MAX_READING_AGE_MS = 60 * 60 * 1000; // Ignore sensors with no reading in the last hour
+
+// Stats timestamps are SQLite-style UTC strings ("YYYY-MM-DD HH:MM:SS")
+const parseUtcTimestamp = (timestamp: string): number =>
+  new Date(timestamp.replace(" ", "T") + "Z").getTime();
 
 const Actions = () => {
   const [rules, setRules] = useState<AutomationRule[]>([]);
@@ -34,6 +39,10 @@ const Actions = () => {
   const [isLoading, setIsLoading] = useState(true);
   const [isDialogOpen, setIsDialogOpen] = useState(false);
   const [isEditing, setIsEditing] = useState<string | null>(null);
+  // Time of the last anomaly each rule has acted on, so every anomaly fires exactly once
+  const handledAnomalies = useRef<Record<string, number>>({});
+  // Anomalies from before the page was opened are not replayed
+  const checksStartedAt = useRef(Date.now());
   
   // Form state
   const [formData, setFormData] = useState<Partial<AutomationRule>>({
@@ -97,17 +106,29 @@ const Actions = () => {
       if (!rule.enabled) continue;
 
       try {
-        // Get latest sensor reading
-        const readings = await api.getSensorReadings(
-          rule.sensorDeviceId,
-          "1h",
-          rule.sensorDataType
-        );
+        // Get latest value and anomaly history from the precomputed stats
+        const stats = await api.getDeviceStats(rule.sensorDeviceId, rule.sensorDataType);
+        const sensorStats = stats[rule.sensorDataType];
+
+        if (!sensorStats || sensorStats.last_value === null || !sensorStats.updated_at) continue;
 
-        if (readings.length === 0) continue;
+        // Skip sensors that have gone quiet
+        if (Date.now() - parseUtcTimestamp(sensorStats.updated_at) > MAX_READING_AGE_MS) continue;
+
+        // Fire once for every anomaly recorded since the last check, not only the latest reading
+        if (rule.condition === "anomaly") {
+          const handledAt = handledAnomalies.current[rule.id] ?? checksStartedAt.current;
+          const newAnomalies = sensorStats.anomalies.filter(
+            (anomaly) => parseUtcTimestamp(anomaly.timestamp) > handledAt
+          );
+          for (const anomaly of newAnomalies) {
+            handledAnomalies.current[rule.id] = parseUtcTimestamp(anomaly.timestamp);
+            await executeRule(rule);
+          }
+          continue;
+        }
 
-        const latestReading = readings[readings.length - 1];
-        const value = latestReading.value;
+        const value = sensorStats.last_value;
 
         // Check condition
         let conditionMet = false;
@@ -294,7 +315,7 @@ const Actions = () => {
                   <div className="flex items-center justify-between text-sm">
                     <span className="text-muted-foreground">Condition:</span>
                     <Badge variant="outline">
-                      {rule.condition} {rule.threshold}
+                      {rule.condition === "anomaly" ? "anomaly" : `${rule.condition} ${rule.threshold}`}
                     </Badge>
                   </div>
                   <div className="flex items-center justify-between text-sm">
@@ -398,7 +419,7 @@ const Actions = () => {
                     <Label>Condition *</Label>
                     <Select
                       value={formData.condition || "above"}
-                      onValueChange={(value: "above" | "below" | "equals") =>
+                      onValueChange={(value: "above" | "below" | "equals" | "anomaly") =>
                         setFormData({ ...formData, condition: value })
                       }
                     >
@@ -409,21 +430,24 @@ const Actions = () => {
                         <SelectItem value="above">Above</SelectItem>
                         <SelectItem value="below">Below</SelectItem>
                         <SelectItem value="equals">Equals</SelectItem>
+                        <SelectItem value="anomaly">Anomaly detected</SelectItem>
                       </SelectContent>
                     </Select>
                   </div>
 
-                  <div className="space-y-2">
-                    <Label>Threshold Value *</Label>
-                    <Input
-                      type="number"
-                      step="0.1"
-                      value={formData.threshold || 0}
-                      onChange={(e) =>
-                        setFormData({ ...formData, threshold: parseFloat(e.target.value) || 0 })
-                      }
-                    />
-                  </div>
+                  {formData.condition !== "anomaly" && (
+                    <div className="space-y-2">
+                      <Label>Threshold Value *</Label>
+                      <Input
+                        type="number"
+                        step="0.1"
+                        value={formData.threshold || 0}
+                        onChange={(e) =>
+                          setFormData({ ...formData, threshold: parseFloat(e.target.value) || 0 })
+                        }
+                      />
+                    </div>
+                  )}
                 </div>
               </div>
 
@@ -24,6 +24,34 @@ export interface SensorReading {
   value: number;
 }
 
+export interface SensorAnomaly {
+  value: number;
+  z_score: number;
+  timestamp: string;
+}
+
+// Rolling statistics for one sensor series, maintained by recever.py
+export interface SensorStats {
+  count: number;
+  mean: number;
+  variance: number;
+  std: number;
+  window_size: number;
+  window_count: number;
+  window_mean: number;
+  window_variance: number;
+  window_std: number;
+  window_min: number | null;
+  window_max: number | null;
+  ewma: number | null;
+  ewma_std: number;
+  last_value: number | null;
+  z_score: number;
+  is_anomaly: boolean;
+  anomalies: SensorAnomaly[];
+  updated_at: string | null;
+}
+
 export interface TimeRange {
   label: string;
   value: string;
@@ -117,6 +145,20 @@ export const api = {
     return Array.isArray(data) ? data : [];
   },
 
+  async getDeviceStats(deviceId: string, dataType?: string): Promise<Record<string, SensorStats>> {
+    const params = new URLSearchParams();
+    if (dataType) params.append("type", dataType);
+
+    const response = await safeFetch(
+      `${API_BASE_URL}/devices/${deviceId}/stats?${params.toString()}`
+    );
+    if (!response.ok) {
+      throw new Error(`Failed to fetch sensor stats: ${response.status}`);
+    }
+    const data = await response.json();
+    return data && data.stats ? data.stats : {};
+  },
+
   async getDeviceDetails(deviceId: string): Promise<ApiDevice> {
     const response = await safeFetch(`${API_BASE_URL}/devices/${deviceId}`);
     if (!response.ok) {
@@ -1,3 +1,8 @@
+// DEPRECATED: sensor alerts are now evaluated by the Python backend.
+// recever.py keeps rolling statistics and anomaly flags per sensor, served from
+// GET /api/devices/<id>/stats, and the Actions page fires rules from that endpoint.
+// Kept only for external callers that still POST readings here; do not add new callers.
+
 import { serve } from "https://deno.land/std@0.168.0/http/server.ts";
 import { createClient } from "https://esm.sh/@supabase/supabase-js@2";
 
@@ -355,7 +355,58 @@ def get_readings(device_id):
         return jsonify({"error": str(e)}), 500
 
 # ============================================
-# 7. API Endpoint: Send command to device
+# 7. API Endpoint: Get rolling statistics and anomalies
+# ============================================
+@app.route('/api/devices/<device_id>/stats', methods=['GET'])
+def get_device_stats(device_id):
+    """Retrieve the streaming statistics kept by recever.py for each sensor of a device"""
+    try:
+        sensor_type = request.args.get('type', None)
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({"error": "Database connection failed"}), 500
+
+        device = conn.execute(
+            'SELECT device_id FROM client WHERE device_id = ?',
+            (device_id,)
+        ).fetchone()
+
+        if device is None:
+            conn.close()
+            return jsonify({"error": "Device not found"}), 404
+
+        # Statistics are precomputed per (device_id, data_type), so this is a key lookup
+        query = "SELECT data_type, summary FROM sensor_stats WHERE device_id = ?"
+        params = [device_id]
+        if sensor_type:
+            query += " AND data_type = ?"
+            params.append(sensor_type)
+
+        try:
+            rows = conn.execute(query, params).fetchall()
+        except sqlite3.OperationalError:
+            rows = []  # recever.py has not created the sensor_stats table yet
+        conn.close()
+
+        stats = {}
+        for row in rows:
+            try:
+                stats[row['data_type']] = json.loads(row['summary'])
+            except:
+                continue
+
+        return jsonify({
+            "device_id": device_id,
+            "stats": stats
+        }), 200
+
+    except Exception as e:
+        print(f"Error in get_device_stats: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# ============================================
+# 8. API Endpoint: Send command to device
 # ============================================
 @app.route('/api/devices/<device_id>/command', methods=['POST'])
 def send_device_command(device_id):
@@ -423,7 +474,7 @@ def send_device_command(device_id):
         return jsonify({"error": str(e)}), 500
 
 # ============================================
-# 8. API Endpoint: Health check
+# 9. API Endpoint: Health check
 # ============================================
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -23,3 +23,15 @@ CREATE TABLE IF NOT EXISTS senseor_data(
 );
 
 
+-- Rolling statistics per (device_id, data_type), maintained by recever.py.
+-- recever.py runs this file on startup to create the table if it is missing.
+CREATE TABLE IF NOT EXISTS sensor_stats(
+  device_id TEXT,
+  data_type TEXT,
+  summary TEXT,
+  state TEXT,
+  window BLOB,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ,
+  PRIMARY KEY (device_id, data_type)
+);
+
@@ -1,12 +1,31 @@
 import paho.mqtt.client as paho
 import sqlite3
 import json
-from datetime import datetime
+import math
+import signal
+import sys
+import threading
+from array import array
+from collections import deque
+from datetime import datetime, timezone
 
 # Database and broker configuration
 DB_PATH = "data/database.db"  # Ensure the path is correct
+SCHEMA_PATH = "data/src_db.sql"  # Schema used to create missing tables (sensor_stats)
 BROKER_IP = "localhost"  # Change to YOUR_MQTT_BROKER_IP if broker is on different host
 
+# Streaming statistics configuration
+STATS_WINDOW_SIZE = 60  # Number of most recent readings in the sliding window
+EWMA_ALPHA = 0.1  # Smoothing factor for the exponentially weighted moving average
+ANOMALY_Z_THRESHOLD = 3.0  # |z-score| above which a reading is flagged
+ANOMALY_MIN_SAMPLES = 10  # Readings needed in the window before flagging starts
+# z-scores use max(window std, ANOMALY_STD_FLOOR, ANOMALY_STD_FLOOR_RATIO * |window mean|),
+# so the first departure from a flat series (e.g. 0 lux overnight) is still flagged
+ANOMALY_STD_FLOOR = 0.1
+ANOMALY_STD_FLOOR_RATIO = 0.01
+ANOMALY_HISTORY = 20  # Number of flagged readings kept per series
+CHECKPOINT_INTERVAL = 10  # Seconds between background checkpoints of the restart state
+
 # ---------------------------------------------------------
 # Helper function for database connection (ensures safe open/close)
 # ---------------------------------------------------------
@@ -18,6 +37,286 @@ def get_db_connection():
         print(f"Error connecting to DB: {e}")
         return None
 
+# ---------------------------------------------------------
+# Streaming statistics per (device_id, data_type)
+# ---------------------------------------------------------
+class SeriesStats:
+    """Running statistics for one sensor series, updated in O(1) per reading"""
+
+    def __init__(self, window_size=STATS_WINDOW_SIZE):
+        self.window_size = window_size
+
+        # All-time mean/variance (Welford)
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+        # Sliding window: ring buffer of the last readings, slot = seq % window_size
+        self.window = array('d', [0.0]) * window_size
+        self.window_count = 0
+        self.window_mean = 0.0
+        self.window_m2 = 0.0
+        # Monotonic queues of sequence numbers for the window min/max
+        self.min_seq = deque()
+        self.max_seq = deque()
+
+        # Exponentially weighted moving average and variance
+        self.ewma = None
+        self.ewma_var = 0.0
+
+        self.last_value = None
+        self.last_z = 0.0
+        self.is_anomaly = False
+        self.anomalies = deque(maxlen=ANOMALY_HISTORY)
+        self.updated_at = None
+
+    def update(self, value):
+        """Add a reading and return True if it was flagged as an anomaly"""
+        x = float(value)
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+        # Score the reading against the window before it is included
+        z = 0.0
+        if self.window_count >= ANOMALY_MIN_SAMPLES:
+            std = max(
+                math.sqrt(self.window_variance()),
+                ANOMALY_STD_FLOOR,
+                ANOMALY_STD_FLOOR_RATIO * abs(self.window_mean)
+            )
+            z = (x - self.window_mean) / std
+        self.last_z = z
+        self.is_anomaly = abs(z) > ANOMALY_Z_THRESHOLD
+        if self.is_anomaly:
+            self.anomalies.append({"value": x, "z_score": round(z, 3), "timestamp": timestamp})
+
+        # All-time Welford update
+        seq = self.count
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+        # Sliding window update (replace the oldest reading once the window is full)
+        slot = seq % self.window_size
+        if self.window_count < self.window_size:
+            self.window_count += 1
+            delta = x - self.window_mean
+            self.window_mean += delta / self.window_count
+            self.window_m2 += delta * (x - self.window_mean)
+        else:
+            old = self.window[slot]
+            old_mean = self.window_mean
+            self.window_mean += (x - old) / self.window_count
+            self.window_m2 = max(0.0, self.window_m2 + (x - old) * (x - self.window_mean + old - old_mean))
+
+        # Min/max queues are updated before the slot is overwritten
+        self._push_extremes(seq, x)
+        self.window[slot] = x
+
+        # EWMA update
+        if self.ewma is None:
+            self.ewma = x
+        else:
+            diff = x - self.ewma
+            incr = EWMA_ALPHA * diff
+            self.ewma += incr
+            self.ewma_var = (1 - EWMA_ALPHA) * (self.ewma_var + diff * incr)
+
+        self.last_value = x
+        self.updated_at = timestamp
+        return self.is_anomaly
+
+    def _push_extremes(self, seq, x):
+        while self.min_seq and self.window[self.min_seq[-1] % self.window_size] >= x:
+            self.min_seq.pop()
+        self.min_seq.append(seq)
+        while self.max_seq and self.window[self.max_seq[-1] % self.window_size] <= x:
+            self.max_seq.pop()
+        self.max_seq.append(seq)
+
+        # Drop sequence numbers that slid out of the window
+        oldest = seq - self.window_size
+        if self.min_seq[0] <= oldest:
+            self.min_seq.popleft()
+        if self.max_seq[0] <= oldest:
+            self.max_seq.popleft()
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def window_variance(self):
+        return self.window_m2 / (self.window_count - 1) if self.window_count > 1 else 0.0
+
+    def summary(self):
+        """Statistics as served by the API"""
+        has_data = self.window_count > 0
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "variance": self.variance(),
+            "std": math.sqrt(self.variance()),
+            "window_size": self.window_size,
+            "window_count": self.window_count,
+            "window_mean": self.window_mean,
+            "window_variance": self.window_variance(),
+            "window_std": math.sqrt(self.window_variance()),
+            "window_min": self.window[self.min_seq[0] % self.window_size] if has_data else None,
+            "window_max": self.window[self.max_seq[0] % self.window_size] if has_data else None,
+            "ewma": self.ewma,
+            "ewma_std": math.sqrt(self.ewma_var),
+            "last_value": self.last_value,
+            "z_score": self.last_z,
+            "is_anomaly": self.is_anomaly,
+            "anomalies": list(self.anomalies),
+            "updated_at": self.updated_at
+        }
+
+    def state(self):
+        """Accumulators needed to resume after a restart (the window is stored separately)"""
+        return {
+            "window_size": self.window_size,
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "window_count": self.window_count,
+            "window_mean": self.window_mean,
+            "window_m2": self.window_m2,
+            "ewma": self.ewma,
+            "ewma_var": self.ewma_var,
+            "last_value": self.last_value,
+            "last_z": self.last_z,
+            "is_anomaly": self.is_anomaly,
+            "anomalies": list(self.anomalies),
+            "updated_at": self.updated_at
+        }
+
+    @classmethod
+    def from_checkpoint(cls, state, window_bytes):
+        stats = cls(state["window_size"])
+        for key in ("count", "mean", "m2", "window_count", "window_mean", "window_m2",
+                    "ewma", "ewma_var", "last_value", "last_z", "is_anomaly", "updated_at"):
+            setattr(stats, key, state[key])
+        stats.anomalies.extend(state["anomalies"])
+        stats.window = array('d')
+        stats.window.frombytes(window_bytes)
+
+        # Rebuild the min/max queues by replaying the window in arrival order
+        for seq in range(stats.count - stats.window_count, stats.count):
+            stats._push_extremes(seq, stats.window[seq % stats.window_size])
+        return stats
+
+
+series_stats = {}  # (device_id, data_type) -> SeriesStats
+dirty_series = set()  # Series changed since the last checkpoint
+stats_lock = threading.Lock()  # Shared by the MQTT callbacks and the checkpoint thread
+
+def init_stats_table():
+    """Create sensor_stats (and any other missing table) from the schema file"""
+    try:
+        con = get_db_connection()
+        if con:
+            with open(SCHEMA_PATH) as f:
+                con.executescript(f.read())
+            con.commit()
+            con.close()
+    except Exception as e:
+        print(f"   -> Error in init_stats_table: {e}")
+
+def load_stats_checkpoint():
+    try:
+        con = get_db_connection()
+        if con:
+            rows = con.execute("""
+                SELECT device_id, data_type, state, window FROM sensor_stats
+                WHERE state IS NOT NULL AND window IS NOT NULL
+            """).fetchall()
+            con.close()
+            for device_id, data_type, state, window_bytes in rows:
+                series_stats[(device_id, data_type)] = SeriesStats.from_checkpoint(json.loads(state), window_bytes)
+            print(f">> [STATS] Restored statistics for {len(rows)} series.")
+    except Exception as e:
+        print(f"   -> Error in load_stats_checkpoint: {e}")
+
+def update_series_stats(device_id, data_type, value):
+    """Feed a reading into its series; returns the series, or None if the value was skipped"""
+    try:
+        x = float(value)
+    except (TypeError, ValueError):
+        print(f"   -> Skipping statistics: non-numeric value {value!r}")
+        return None
+    if not math.isfinite(x):
+        print(f"   -> Skipping statistics: non-finite value {value!r}")
+        return None
+
+    key = (device_id, data_type)
+    stats = series_stats.get(key)
+    if stats is None:
+        stats = series_stats[key] = SeriesStats()
+    if stats.update(x):
+        print(f"   -> [ANOMALY] {device_id}/{data_type} = {x} (z={stats.last_z:.2f})")
+    dirty_series.add(key)
+    return stats
+
+def save_stats_summary(con, device_id, data_type, summary):
+    """Upsert the served summary of one series; committed together with the reading"""
+    try:
+        con.execute("""
+            INSERT INTO sensor_stats(device_id, data_type, summary, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(device_id, data_type) DO UPDATE SET
+                summary = excluded.summary,
+                updated_at = excluded.updated_at
+        """, (device_id, data_type, summary))
+    except Exception as e:
+        # The reading is still saved; the next checkpoint upserts the row
+        print(f"   -> Error in save_stats_summary: {e}")
+
+def checkpoint_stats(con):
+    """Write the restart state of every series changed since the last checkpoint"""
+    with stats_lock:
+        pending = [
+            (key, json.dumps(series_stats[key].summary()), json.dumps(series_stats[key].state()),
+             series_stats[key].window.tobytes())
+            for key in dirty_series
+        ]
+        dirty_series.clear()
+    if not pending:
+        return
+    try:
+        cur = con.cursor()
+        for (device_id, data_type), summary, state, window_bytes in pending:
+            # The summary is only written if the row is new; handling_data keeps it current
+            cur.execute("""
+                INSERT INTO sensor_stats(device_id, data_type, summary, state, window, updated_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(device_id, data_type) DO UPDATE SET
+                    state = excluded.state,
+                    window = excluded.window
+            """, (device_id, data_type, summary, state, window_bytes))
+        con.commit()
+    except Exception as e:
+        # Keep the series dirty so the next checkpoint retries them
+        with stats_lock:
+            dirty_series.update(key for key, _, _, _ in pending)
+        print(f"   -> Error in checkpoint_stats: {e}")
+
+def flush_stats():
+    con = get_db_connection()
+    if con:
+        checkpoint_stats(con)
+        con.close()
+
+def checkpoint_worker(stop_event):
+    """Flush the restart state every CHECKPOINT_INTERVAL seconds, independent of incoming messages"""
+    while not stop_event.wait(CHECKPOINT_INTERVAL):
+        flush_stats()
+
+def handle_sigterm(signum, frame):
+    # Save pending statistics so the next start resumes where we stopped
+    flush_stats()
+    print("Server stopped.")
+    sys.exit(0)
+
 # ---------------------------------------------------------
 # 1. Sensor Data Handler
 # ---------------------------------------------------------
@@ -39,6 +338,15 @@ def handling_data(client, userdata, msg):
                 VALUES (?, ?, ?)
             """, (reg_data["device_id"], reg_data["data_type"], reg_data["value"]))
             
+
+            # Update the running statistics; the summary is committed with the reading,
+            # the restart state is written by checkpoint_worker
+            with stats_lock:
+                stats = update_series_stats(reg_data["device_id"], reg_data["data_type"], reg_data["value"])
+                summary = json.dumps(stats.summary()) if stats else None
+            if summary:
+                save_stats_summary(con, reg_data["device_id"], reg_data["data_type"], summary)
+
             con.commit()
             con.close()  # Closing connection is essential
             print("   -> Data saved successfully.")
@@ -153,35 +461,47 @@ def on_connect(client, userdata, flags, rc):
 # Main execution
 # ---------------------------------------------------------
 
-# Note: In newer versions of paho it's preferred to specify the version, but current code works
-client = paho.Client()
-
-# Bind general callback functions
-client.on_connect = on_connect
-
-# Connect
-print("Connecting to broker...")
-try:
-    client.connect(BROKER_IP, 1883, 60)  # 60 is the KeepAlive period
-except Exception as e:
-    print(f"Could not connect to broker: {e}")
-    exit()
+# Kept under __main__ so the statistics code can be imported without a broker
+if __name__ == "__main__":
+    # Restore statistics from the last checkpoint instead of re-scanning senseor_data
+    init_stats_table()
+    load_stats_checkpoint()
 
-# Assign functions to topics (Routing)
-# 1. Registration topic (name corrected to config)
-client.message_callback_add("config", device_registering)
+    # Note: In newer versions of paho it's preferred to specify the version, but current code works
+    client = paho.Client()
 
-# 2. Data topic (set to receive anything starting with data/)
-# Ensure Arduino sends to data/rt-1 instead of room/temp/rt-1 to simplify code
-client.message_callback_add("data/+", handling_data) 
-# You can keep "room/+" if you prefer the old structure
+    # Bind general callback functions
+    client.on_connect = on_connect
 
-# 3. Status topic (Offline/Online)
-client.message_callback_add("devices/+/status", handling_status)
+    # Connect
+    print("Connecting to broker...")
+    try:
+        client.connect(BROKER_IP, 1883, 60)  # 60 is the KeepAlive period
+    except Exception as e:
+        print(f"Could not connect to broker: {e}")
+        exit()
 
-print("Server is running and listening...")
-client.loop_forever()
+    # Assign functions to topics (Routing)
+    # 1. Registration topic (name corrected to config)
+    client.message_callback_add("config", device_registering)
 
+    # 2. Data topic (set to receive anything starting with data/)
+    # Ensure Arduino sends to data/rt-1 instead of room/temp/rt-1 to simplify code
+    client.message_callback_add("data/+", handling_data) 
+    # You can keep "room/+" if you prefer the old structure
 
+    # 3. Status topic (Offline/Online)
+    client.message_callback_add("devices/+/status", handling_status)
 
+    # Periodic checkpoints and a final flush on shutdown
+    stop_checkpoints = threading.Event()
+    threading.Thread(target=checkpoint_worker, args=(stop_checkpoints,), daemon=True).start()
+    signal.signal(signal.SIGTERM, handle_sigterm)
 
+    print("Server is running and listening...")
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        stop_checkpoints.set()
+        flush_stats()
+        print("Server stopped.")
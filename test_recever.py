@@ -0,0 +1,109 @@
+import json
+import os
+import random
+import statistics
+
+import pytest
+
+import recever
+from recever import SeriesStats
+
+
+def feed(stats, values):
+    for value in values:
+        stats.update(value)
+
+
+def test_window_matches_recomputed_statistics():
+    rng = random.Random(1)
+    stats = SeriesStats(window_size=25)
+    values = []
+    for _ in range(2000):
+        value = rng.gauss(20, 5)
+        stats.update(value)
+        values.append(value)
+
+        window = values[-25:]
+        summary = stats.summary()
+        assert summary["window_count"] == len(window)
+        assert summary["window_mean"] == pytest.approx(statistics.mean(window))
+        assert summary["window_min"] == min(window)
+        assert summary["window_max"] == max(window)
+        if len(window) > 1:
+            assert summary["window_variance"] == pytest.approx(statistics.variance(window))
+
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(statistics.mean(values))
+    assert stats.variance() == pytest.approx(statistics.variance(values))
+
+
+def test_window_min_max_expire_with_monotonic_values():
+    stats = SeriesStats(window_size=3)
+    feed(stats, [1, 2, 3, 4, 5])
+    assert (stats.summary()["window_min"], stats.summary()["window_max"]) == (3, 5)
+    feed(stats, [4, 3, 2])
+    assert (stats.summary()["window_min"], stats.summary()["window_max"]) == (2, 4)
+
+
+def test_checkpoint_round_trip_resumes_identically():
+    rng = random.Random(2)
+    stats = SeriesStats(window_size=10)
+    feed(stats, [rng.uniform(0, 100) for _ in range(37)])
+
+    state = json.loads(json.dumps(stats.state()))
+    restored = SeriesStats.from_checkpoint(state, stats.window.tobytes())
+    assert restored.summary() == stats.summary()
+
+    for value in [rng.uniform(0, 100) for _ in range(20)]:
+        assert restored.update(value) == stats.update(value)
+    assert restored.summary() == stats.summary()
+
+
+def test_spike_after_flat_series_is_flagged():
+    stats = SeriesStats()
+    feed(stats, [20] * 30)
+    assert stats.update(100) is True
+    assert stats.summary()["anomalies"][-1]["value"] == 100.0
+
+    # Readings within the std floor are not anomalies
+    stats = SeriesStats()
+    feed(stats, [20] * 30)
+    assert stats.update(20.1) is False
+
+    stats = SeriesStats()
+    feed(stats, [0] * 30)
+    assert stats.update(5) is True
+
+
+def test_no_flagging_before_min_samples():
+    stats = SeriesStats()
+    feed(stats, [20] * (recever.ANOMALY_MIN_SAMPLES - 1))
+    assert stats.update(100) is False
+
+
+@pytest.mark.parametrize("value", ["abc", None, "nan", "inf", float("nan"), float("-inf")])
+def test_invalid_values_do_not_create_series(value):
+    recever.series_stats.clear()
+    recever.dirty_series.clear()
+    assert recever.update_series_stats("dev", "bad", value) is None
+    assert recever.series_stats == {}
+    assert recever.dirty_series == set()
+
+
+def test_checkpoint_and_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(recever, "DB_PATH", str(tmp_path / "database.db"))
+    monkeypatch.setattr(recever, "SCHEMA_PATH", os.path.join(os.path.dirname(recever.__file__), "data", "src_db.sql"))
+    recever.series_stats.clear()
+    recever.dirty_series.clear()
+    recever.init_stats_table()
+
+    for value in [20, 21, 22, 23]:
+        recever.update_series_stats("dev", "temp", value)
+    # No summary row exists yet; the checkpoint must create it
+    recever.flush_stats()
+    assert recever.dirty_series == set()
+
+    expected = recever.series_stats[("dev", "temp")].summary()
+    recever.series_stats.clear()
+    recever.load_stats_checkpoint()
+    assert recever.series_stats[("dev", "temp")].summary() == expected